@@ -0,0 +1,772 @@
+# Code Beautifier 1.0 - differential fuzzing harness
+
+# Copyright (C) <2024>  <khundian.twitch@gmail.com>
+# This script is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This script is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import gc
+import random
+import re
+import timeit
+
+# PythonScript runs every script in the __main__ namespace, where the running Code Beautifier script lives
+import __main__ as beautifier
+
+
+def reference_adjust_keyword_capitalization(line, keyword_groups):
+    """
+    Frozen reference of adjust_keyword_capitalization, used by run_differential_fuzz.
+
+    Do not optimize this function, it defines the expected output of every faster implementation.
+
+    Args:
+        line (str): The line to adjust.
+        keyword_groups (dict): A dictionary containing keyword groups where keys are group names and values are sets of keywords.
+
+    Returns:
+        str: The adjusted line with proper capitalization for keywords.
+    """
+    keyword_dict = {}
+    for group_keywords in keyword_groups.values():
+        for keyword in group_keywords:
+            keyword_dict[keyword.lower()] = keyword
+    adjusted_line = ""
+    current_word = ""
+    for char in line:
+        if char.isalnum() or char == "_":
+            current_word += char
+        else:
+            if current_word.lower() in keyword_dict:
+                adjusted_line += keyword_dict[current_word.lower()]
+            else:
+                adjusted_line += current_word
+            adjusted_line += char
+            current_word = ""
+    if current_word.lower() in keyword_dict:
+        adjusted_line += keyword_dict[current_word.lower()]
+    else:
+        adjusted_line += current_word
+    return adjusted_line
+
+
+def reference_code_spans(line, profile, open_block):
+    """
+    Frozen reference of scan_code_spans, walking the line one character at a time.
+
+    Args:
+        line (str): The line to scan.
+        profile (LanguageProfile): The settings of the language of the line.
+        open_block (str or None): The closing delimiter of a block comment left open by the previous line.
+
+    Returns:
+        tuple: A list of (start, end) tuples of the code regions of the line, and the closing delimiter of a block
+            comment left open at the end of the line or None.
+    """
+    delimiters = {}
+    for quote in profile.string_characters:
+        if quote:
+            delimiters[quote] = ("string", quote)
+    for opening, closing in profile.block_comments:
+        delimiters[opening] = ("block", closing)
+    for comment in profile.comment_characters:
+        if comment:
+            delimiters[comment] = ("line", None)
+    ordered_delimiters = sorted(delimiters, key=len, reverse=True)
+
+    def is_word_character(char):
+        return char.isalnum() or char == "_"
+
+    def delimiter_at(pos):
+        for delimiter in ordered_delimiters:
+            if not line.startswith(delimiter, pos):
+                continue
+            if (
+                is_word_character(delimiter[0])
+                and pos > 0
+                and is_word_character(line[pos - 1])
+            ):
+                continue
+            end = pos + len(delimiter)
+            if (
+                is_word_character(delimiter[-1])
+                and end < len(line)
+                and is_word_character(line[end])
+            ):
+                continue
+            return delimiter
+        return None
+
+    code_spans = []
+    code_start = 0
+    if open_block is not None:
+        if open_block not in line:
+            return code_spans, open_block
+        code_start = line.index(open_block) + len(open_block)
+    pos = code_start
+    while pos < len(line):
+        delimiter = delimiter_at(pos)
+        if delimiter is None:
+            pos += 1
+            continue
+        code_spans.append((code_start, pos))
+        kind, closing = delimiters[delimiter]
+        if kind == "line":
+            return code_spans, None
+        if kind == "block":
+            if closing not in line[pos + len(delimiter) :]:
+                return code_spans, closing
+            pos = line.index(closing, pos + len(delimiter)) + len(closing)
+        else:
+            pos += len(delimiter)
+            while pos < len(line) and line[pos] != closing:
+                escaped = (
+                    profile.escape_character and line[pos] == profile.escape_character
+                )
+                pos += 2 if escaped else 1
+            if pos >= len(line):
+                return code_spans, None
+            pos += len(closing)
+        code_start = pos
+    code_spans.append((code_start, len(line)))
+    return code_spans, None
+
+
+def reference_beautify_text(text, profile):
+    """
+    Frozen reference of beautify_text, used by run_differential_fuzz.
+
+    Every line is rebuilt the straightforward way. Do not optimize this function, it defines the expected output of
+    every faster formatting engine.
+
+    Args:
+        text (str): The document to beautify.
+        profile (LanguageProfile): The settings of the language of the document.
+
+    Returns:
+        str: The beautified document.
+    """
+    indent_groups = dict(profile.keyword_groups)
+    keyword_patterns = {}
+    for group, keywords in indent_groups.items():
+        pattern = r"\b(?:{})\b".format(
+            "|".join(re.escape(keyword) for keyword in keywords)
+        )
+        keyword_patterns[group] = re.compile(pattern, flags=re.IGNORECASE)
+    beautified_lines = []
+    current_indentation = 0
+    open_block = None
+    for line in text.split("\n"):
+        code_spans, open_block = reference_code_spans(line, profile, open_block)
+        code = "".join(line[start:end] for start, end in code_spans)
+        indentation = (
+            " " * profile.space_count * current_indentation
+            if profile.use_spaces
+            else "\t" * current_indentation
+        )
+        if not line.strip():
+            beautified_lines.append("")
+        elif not code.strip():
+            beautified_lines.append(indentation + re.sub(r"^\s+", "", line))
+        else:
+            groups = set(
+                group
+                for group, pattern in keyword_patterns.items()
+                if any(pattern.search(line, start, end) for start, end in code_spans)
+            )
+            if "IndentLeft" in groups or "IndentBoth" in groups:
+                current_indentation = max(0, current_indentation - 1)
+            indentation = (
+                " " * profile.space_count * current_indentation
+                if profile.use_spaces
+                else "\t" * current_indentation
+            )
+            pos = len(line) - len(re.sub(r"^\s+", "", line))
+            adjusted_line = ""
+            for start, end in code_spans:
+                if end <= pos:
+                    continue
+                start = max(start, pos)
+                adjusted_line += line[pos:start]
+                adjusted_line += reference_adjust_keyword_capitalization(
+                    line[start:end], indent_groups
+                )
+                pos = end
+            adjusted_line += line[pos:]
+            beautified_lines.append(indentation + adjusted_line)
+            if "IndentRight" in groups or "IndentBoth" in groups:
+                current_indentation += 1
+    if beautified_lines and not beautified_lines[-1]:
+        beautified_lines = beautified_lines[:-1]
+    beautified_lines.append("")
+    return "\n".join(beautified_lines)
+
+
+def generate_fuzz_profile(rng):
+    """
+    Generate a random language profile for run_differential_fuzz.
+
+    The keywords include regular expression metacharacters, differently capitalized duplicates, empty keywords and
+    empty groups.
+
+    Args:
+        rng (random.Random): The random number generator.
+
+    Returns:
+        LanguageProfile: The generated profile.
+    """
+    keywords = [
+        "BEGIN",
+        "End",
+        "if",
+        "THEN",
+        "Else",
+        "loop",
+        "SELECT",
+        "from",
+        "x1",
+        "_u",
+        "a+b",
+        "c++",
+        "$var",
+        "(x)",
+        "end.if",
+        "a|b",
+        "[x]",
+        "x*",
+        "?",
+        "^",
+        "\\d",
+        "END IF",
+    ]
+    keyword_groups = {}
+    for group in ["IndentRight", "IndentLeft", "IndentBoth", "IndentNone"]:
+        if rng.random() < 0.8:
+            group_keywords = rng.sample(keywords, rng.randint(0, 4))
+            # Add the empty keyword saved by the settings window for an empty text widget
+            if rng.random() < 0.1:
+                group_keywords.append("")
+            keyword_groups[group] = [
+                rng.choice([keyword, keyword.lower(), keyword.upper()])
+                for keyword in group_keywords
+            ]
+    # Build the profile directly, from_settings would leave out the empty groups
+    return beautifier.LanguageProfile(
+        keyword_groups=keyword_groups.items(),
+        use_spaces=rng.random() < 0.5,
+        space_count=rng.randint(1, 4),
+        comment_characters=rng.sample(
+            ["--", "#", "//", "REM", ";", ""], rng.randint(0, 2)
+        ),
+        block_comments=rng.sample(
+            [("/*", "*/"), ("{-", "-}"), ("(*", "*)")], rng.randint(0, 2)
+        ),
+        string_characters=rng.sample(["'", '"', "`"], rng.randint(0, 2)),
+        escape_character=rng.choice(["", "\\"]),
+    )
+
+
+def generate_fuzz_document(rng, profile):
+    """
+    Generate a random document for run_differential_fuzz.
+
+    The documents include keywords in any capitalization, comment and string delimiters, mixed whitespace, carriage
+    returns, comment-only documents and documents starting with an IndentBoth keyword.
+
+    Args:
+        rng (random.Random): The random number generator.
+        profile (LanguageProfile): The profile whose keywords and delimiters are used in the document.
+
+    Returns:
+        str: The generated document.
+    """
+    keywords = [
+        keyword for group, keywords in profile.keyword_groups for keyword in keywords
+    ]
+    delimiters = (
+        list(profile.comment_characters)
+        + [delimiter for pair in profile.block_comments for delimiter in pair]
+        + list(profile.string_characters)
+    )
+    tokens = [
+        "x",
+        "foo_bar",
+        "42",
+        "(",
+        ")",
+        ";",
+        ",",
+        ".",
+        "\\",
+        " ",
+        " ",
+        "\t",
+        "\r",
+        "\xe9",
+    ]
+
+    def random_line():
+        parts = []
+        for _ in range(rng.randint(0, 8)):
+            choice = rng.random()
+            if keywords and choice < 0.35:
+                keyword = rng.choice(keywords)
+                parts.append(
+                    rng.choice(
+                        [keyword, keyword.lower(), keyword.upper(), keyword.title()]
+                    )
+                )
+            elif delimiters and choice < 0.5:
+                parts.append(rng.choice(delimiters))
+            else:
+                parts.append(rng.choice(tokens))
+            if rng.random() < 0.6:
+                parts.append(" ")
+        return rng.choice(["", " ", "\t", "  "]) + "".join(parts)
+
+    lines = [random_line() for _ in range(rng.randint(0, 20))]
+    kind = rng.random()
+    if kind < 0.1 and profile.comment_characters:
+        # Document containing only comments
+        lines = [
+            rng.choice(["", " ", "\t"]) + rng.choice(profile.comment_characters) + line
+            for line in lines
+        ]
+    elif kind < 0.2:
+        # Document starting with an IndentBoth keyword
+        both_keywords = dict(profile.keyword_groups).get("IndentBoth")
+        if both_keywords:
+            lines.insert(0, rng.choice(both_keywords))
+    return "\n".join(lines)
+
+
+# Frozen copy of the engine, kept as the throughput baseline so that a slowdown of the shared helpers is caught
+frozen_word_pattern = re.compile(r"\w+", re.LOCALE)
+frozen_non_whitespace_pattern = re.compile(r"\S")
+
+
+def frozen_compile_lexical_syntax(
+    comment_characters, block_comments, string_characters, escape_character=""
+):
+    """
+    Frozen copy of compile_lexical_syntax.
+    """
+    delimiters = {}
+    for quote in string_characters:
+        if quote:
+            # A string literal ends at the next unescaped quote character
+            if escape_character:
+                closing = re.compile(
+                    r"(?:{1}.|[^{1}{0}])*{0}".format(
+                        re.escape(quote), re.escape(escape_character)
+                    ),
+                    flags=re.DOTALL,
+                )
+            else:
+                closing = re.compile(r"[^{0}]*{0}".format(re.escape(quote)))
+            delimiters[quote] = ("string", closing)
+    for opening, closing in block_comments:
+        delimiters[opening] = ("block", closing)
+    for comment in comment_characters:
+        if comment:
+            delimiters[comment] = ("line", None)
+    if not delimiters:
+        return None
+    alternatives = []
+    for delimiter in sorted(delimiters, key=len, reverse=True):
+        alternative = re.escape(delimiter)
+        if re.match(r"\w", delimiter):
+            alternative = r"(?<!\w)" + alternative
+        if re.match(r"\w", delimiter[-1]):
+            alternative += r"(?!\w)"
+        alternatives.append(alternative)
+    return re.compile("|".join(alternatives)), delimiters
+
+
+def frozen_scan_code_spans(line, lexical_syntax, open_block=None):
+    """
+    Frozen copy of scan_code_spans.
+    """
+    if lexical_syntax is None:
+        return [(0, len(line))], None
+    delimiter_pattern, delimiters = lexical_syntax
+    code_spans = []
+    pos = 0
+    # Skip the remainder of a block comment opened on a previous line
+    if open_block is not None:
+        block_end = line.find(open_block)
+        if block_end == -1:
+            return code_spans, open_block
+        pos = block_end + len(open_block)
+    while True:
+        match = delimiter_pattern.search(line, pos)
+        if match is None:
+            code_spans.append((pos, len(line)))
+            return code_spans, None
+        if match.start() > pos:
+            code_spans.append((pos, match.start()))
+        kind, closing = delimiters[match.group()]
+        if kind == "line":
+            return code_spans, None
+        if kind == "block":
+            block_end = line.find(closing, match.end())
+            if block_end == -1:
+                return code_spans, closing
+            pos = block_end + len(closing)
+        else:
+            string_end = closing.match(line, match.end())
+            # An unterminated string literal runs to the end of the line
+            if string_end is None:
+                return code_spans, None
+            pos = string_end.end()
+
+
+def frozen_has_code(line, code_spans):
+    """
+    Frozen copy of has_code.
+    """
+    return any(
+        frozen_non_whitespace_pattern.search(line, start, end)
+        for start, end in code_spans
+    )
+
+
+def frozen_build_keyword_dict(keyword_groups):
+    """
+    Frozen copy of build_keyword_dict.
+    """
+    keyword_dict = {}
+    for group_keywords in keyword_groups.values():
+        for keyword in group_keywords:
+            keyword_dict[keyword.lower()] = keyword
+    return keyword_dict
+
+
+def frozen_has_expected_indentation(line, indentation):
+    """
+    Frozen copy of has_expected_indentation.
+    """
+    return (
+        len(line) > len(indentation)
+        and line.startswith(indentation)
+        and not line[len(indentation)].isspace()
+    )
+
+
+def frozen_has_canonical_keyword_case(line, keyword_dict, start=0, end=None):
+    """
+    Frozen copy of has_canonical_keyword_case.
+    """
+    if end is None:
+        end = len(line)
+    for match in frozen_word_pattern.finditer(line, start, end):
+        word = match.group()
+        keyword = keyword_dict.get(word.lower())
+        if keyword is not None and keyword != word:
+            return False
+    return True
+
+
+def frozen_capitalize_keywords(line, keyword_dict):
+    """
+    Frozen copy of capitalize_keywords.
+    """
+    # Adjust the capitalization of keywords while preserving punctuation marks
+    adjusted_line = ""
+    current_word = ""
+    for char in line:
+        if char.isalnum() or char == "_":
+            # Build the current word character by character
+            current_word += char
+        else:
+            if current_word.lower() in keyword_dict:
+                # Replace the current word with its original form if it's a keyword
+                adjusted_line += keyword_dict[current_word.lower()]
+            else:
+                # Preserve the current word if it's not a keyword
+                adjusted_line += current_word
+            # Append the current character (punctuation mark) to the adjusted line
+            adjusted_line += char
+            # Reset the current word
+            current_word = ""
+    # Handle the last word in the line
+    if current_word.lower() in keyword_dict:
+        adjusted_line += keyword_dict[current_word.lower()]
+    else:
+        adjusted_line += current_word
+
+    return adjusted_line
+
+
+def frozen_adjust_code_capitalization(line, code_spans, start, keyword_dict):
+    """
+    Frozen copy of adjust_code_capitalization.
+    """
+    adjusted_parts = []
+    pos = start
+    for span_start, span_end in code_spans:
+        if span_end <= pos:
+            continue
+        span_start = max(span_start, pos)
+        # Keep the comments and strings before the code region as they are
+        adjusted_parts.append(line[pos:span_start])
+        adjusted_parts.append(
+            frozen_capitalize_keywords(line[span_start:span_end], keyword_dict)
+        )
+        pos = span_end
+    adjusted_parts.append(line[pos:])
+    return "".join(adjusted_parts)
+
+
+def frozen_compile_keyword_regex(keywords):
+    """
+    Frozen copy of compile_keyword_regex.
+    """
+    # Construct a regex pattern to match any of the keywords using a non-capturing group
+    pattern = r"\b(?:{})\b".format("|".join(re.escape(keyword) for keyword in keywords))
+    # Compile the regex pattern with the IGNORECASE flag to make it case-insensitive
+    return re.compile(pattern, flags=re.IGNORECASE)
+
+
+def frozen_beautify_text(text, profile):
+    """
+    Frozen copy of beautify_text.
+    """
+    # Extract relevant settings from language settings
+    indent_groups = dict(profile.keyword_groups)
+    indent_unit = " " * profile.space_count if profile.use_spaces else "\t"
+
+    leading_whitespace_pattern = re.compile(r"^\s+")
+    keyword_patterns = {
+        group: frozen_compile_keyword_regex(keywords)
+        for group, keywords in indent_groups.items()
+    }
+    keyword_dict = frozen_build_keyword_dict(indent_groups)
+    lexical_syntax = frozen_compile_lexical_syntax(
+        profile.comment_characters,
+        profile.block_comments,
+        profile.string_characters,
+        profile.escape_character,
+    )
+    beautified_lines = []
+    current_indentation = 0
+    open_block = None
+    lines = text.split("\n")
+
+    # Iterate through each line in the document
+    for line in lines:
+        # Find the code regions of the line, hiding comments and strings from the keyword patterns
+        code_spans, open_block = frozen_scan_code_spans(
+            line, lexical_syntax, open_block
+        )
+        if not line.strip():
+            beautified_lines.append("")
+        elif not frozen_has_code(line, code_spans):
+            # Handle lines containing only comments or strings
+            indentation = indent_unit * current_indentation
+            if frozen_has_expected_indentation(line, indentation):
+                beautified_lines.append(line)
+            else:
+                # Keep trailing whitespace, such as the carriage return of CRLF line endings
+                line = re.sub(leading_whitespace_pattern, "", line)
+                beautified_lines.append(indentation + line)
+        else:
+            # Handle lines containing code
+            indent_right, indent_left, indent_both, indent_none = (
+                False,
+                False,
+                False,
+                False,
+            )
+            # Check for keyword patterns in the code regions only
+            for group, pattern in keyword_patterns.items():
+                if any(pattern.search(line, start, end) for start, end in code_spans):
+                    if group == "IndentRight":
+                        indent_right = True
+                    elif group == "IndentLeft":
+                        indent_left = True
+                    elif group == "IndentBoth":
+                        indent_both = True
+                    elif group == "IndentNone":
+                        indent_none = True
+            # Adjust indentation based on patterns
+            if indent_left and not indent_both:
+                current_indentation = max(0, current_indentation - 1)
+            elif indent_both:
+                current_indentation = max(0, current_indentation - 1)
+            indentation = indent_unit * current_indentation
+            if frozen_has_expected_indentation(line, indentation) and all(
+                frozen_has_canonical_keyword_case(line, keyword_dict, start, end)
+                for start, end in code_spans
+            ):
+                # Emit the line unchanged if it is already correctly formatted
+                beautified_lines.append(line)
+            else:
+                leading_whitespace = leading_whitespace_pattern.match(line)
+                line = frozen_adjust_code_capitalization(
+                    line,
+                    code_spans,
+                    leading_whitespace.end() if leading_whitespace else 0,
+                    keyword_dict,
+                )
+                beautified_lines.append(indentation + line)
+            if indent_right or (indent_both and line.strip()):
+                current_indentation += 1
+            elif indent_none:
+                pass
+    if beautified_lines and not beautified_lines[-1]:
+        beautified_lines = beautified_lines[:-1]
+    beautified_lines.append("")
+
+    return "\n".join(beautified_lines)
+
+
+def run_differential_fuzz(
+    engines=None,
+    iterations=500,
+    seed=0,
+    min_throughput_ratio=0.9,
+    baseline_engine=frozen_beautify_text,
+):
+    """
+    Compare formatting engines against the frozen reference on random documents and profiles.
+
+    Every engine must give exactly the same output as reference_beautify_text, and adjust_keyword_capitalization
+    and has_canonical_keyword_case must agree with reference_adjust_keyword_capitalization. Each engine must also
+    beautify at least min_throughput_ratio times as many lines per second as the baseline engine, measured on
+    longer generated documents and on their already beautified versions.
+
+    Args:
+        engines (dict or None): A dictionary mapping engine names to functions taking a document and a profile and
+            returning the beautified document, or None to check beautify_text with the fast path.
+        iterations (int): The number of random profiles and documents to generate.
+        seed (int): The seed of the random number generator, to reproduce a run.
+        min_throughput_ratio (float): The lowest accepted ratio between the lines per second of an engine and of
+            the baseline engine.
+        baseline_engine (function): The engine the throughput of the other engines is compared with, by default
+            the frozen copy of beautify_text.
+
+    Returns:
+        bool: True if every engine matched the reference and was fast enough, False otherwise.
+    """
+    # Keep the counters of the user's last beautification, which the shipped engine overwrites
+    saved_counters = dict(beautifier.fast_path_counters)
+    try:
+        if engines is None:
+            engines = {
+                "beautify_text": beautifier.beautify_text,
+            }
+        rng = random.Random(seed)
+        failures = []
+        corpus = []
+        for iteration in range(iterations):
+            profile = generate_fuzz_profile(rng)
+            document = generate_fuzz_document(rng, profile)
+            expected = reference_beautify_text(document, profile)
+            # Keep a longer document of every tenth profile to measure the throughput
+            if iteration % 10 == 0:
+                long_document = "\n".join(
+                    generate_fuzz_document(rng, profile) for _ in range(20)
+                )
+                corpus.append((long_document, profile))
+                corpus.append(
+                    (reference_beautify_text(long_document, profile), profile)
+                )
+            # Check the document as typed and once it has been beautified
+            for text in (document, expected):
+                expected_text = reference_beautify_text(text, profile)
+                for name, engine in engines.items():
+                    if engine(text, profile) != expected_text:
+                        failures.append(
+                            "{} differs from the reference for seed {}, iteration {}: {!r}".format(
+                                name, seed, iteration, text
+                            )
+                        )
+            # Check keyword capitalization line by line
+            indent_groups = dict(profile.keyword_groups)
+            keyword_dict = beautifier.build_keyword_dict(indent_groups)
+            for line in document.split("\n"):
+                expected_line = reference_adjust_keyword_capitalization(
+                    line, indent_groups
+                )
+                if (
+                    beautifier.adjust_keyword_capitalization(line, indent_groups)
+                    != expected_line
+                ):
+                    failures.append(
+                        "adjust_keyword_capitalization differs from the reference for seed {}, iteration {}: {!r}".format(
+                            seed, iteration, line
+                        )
+                    )
+                if beautifier.has_canonical_keyword_case(line, keyword_dict) != (
+                    expected_line == line
+                ):
+                    failures.append(
+                        "has_canonical_keyword_case differs from the reference for seed {}, iteration {}: {!r}".format(
+                            seed, iteration, line
+                        )
+                    )
+
+        # Measure the throughput of the baseline engine and of each engine on the same documents
+        line_count = sum(text.count("\n") + 1 for text, profile in corpus)
+
+        def run_engine(engine):
+            start_time = timeit.default_timer()
+            for text, profile in corpus:
+                engine(text, profile)
+            return timeit.default_timer() - start_time
+
+        # Time the engines in turns and keep the best time of each, so they see the same machine load
+        timed_engines = [("baseline", baseline_engine)] + sorted(engines.items())
+        best_times = {}
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(7):
+                for name, engine in timed_engines:
+                    elapsed_time = run_engine(engine)
+                    best_times[name] = min(
+                        best_times.get(name, elapsed_time), elapsed_time
+                    )
+        finally:
+            if gc_enabled:
+                gc.enable()
+        baseline_rate = line_count / max(best_times["baseline"], 1e-9)
+        print("baseline: {:.0f} lines/sec".format(baseline_rate))
+        for name, engine in sorted(engines.items()):
+            rate = line_count / max(best_times[name], 1e-9)
+            print(
+                "{}: {:.0f} lines/sec ({:.2f}x)".format(
+                    name, rate, rate / baseline_rate
+                )
+            )
+            if rate < min_throughput_ratio * baseline_rate:
+                failures.append(
+                    "{} is slower than {:.2f}x the baseline engine".format(
+                        name, min_throughput_ratio
+                    )
+                )
+
+        for failure in failures[:20]:
+            print(failure)
+        if failures:
+            print("{} differential fuzzing failures".format(len(failures)))
+        return not failures
+    finally:
+        beautifier.fast_path_counters.update(saved_counters)
+
+
+# Run the harness when the script is executed, once Code Beautifier is running
+if hasattr(beautifier, "beautify_text"):
+    run_differential_fuzz()
+else:
+    print("Run the Code Beautifier script before the differential fuzzing harness.")
@@ -16,6 +16,9 @@
 
 import os
 import re
+import sys
+import threading
+import Queue
 import Tkinter as tk
 from collections import defaultdict
 
@@ -26,7 +29,35 @@ comment_characters = ["#"]  # Default character used to denote comments in the c
 # Constants for file paths and settings
 open_settings_window = "code_beautifier_settings"  # String to open the settings window
 settings_folder = "plugins/Config/PythonScript/scripts/Code Beautifier"  # Folder containing language settings files
-language_settings = defaultdict(set)  # Default dictionary to store language settings
+language_settings = {}  # Dictionary mapping language names to their LanguageProfile
+# Names of the settings lines in a language settings file, besides the keyword groups
+settings_keys = (
+    "UseSpaces",
+    "SpaceCount",
+    "CommentCharacters",
+    "BlockComments",
+    "StringCharacters",
+    "EscapeCharacter",
+)
+settings_updates = Queue.Queue()  # Profiles saved in the settings window
+saved_profiles = {}  # Profiles saved in the settings window, used by its thread only
+settings_window_thread = None  # Thread running the settings window while it is open
+# Character codes of the last character of the string to open the settings window
+settings_trigger_characters = (
+    ord(open_settings_window[-1].lower()),
+    ord(open_settings_window[-1].upper()),
+)
+# Pattern matching words for capitalization, with the locale dependent letters and digits of str.isalnum
+word_pattern = re.compile(r"\w+", re.LOCALE)
+non_whitespace_pattern = re.compile(r"\S")  # Pattern matching non-whitespace
+# Counters describing how many lines, and characters excluding newlines, of the last beautified document were
+# emitted unchanged
+fast_path_counters = {
+    "lines": 0,
+    "fast_path_lines": 0,
+    "characters": 0,
+    "fast_path_characters": 0,
+}
 
 
 def load_keyword_groups(file_path):
@@ -60,6 +91,9 @@ def load_keyword_groups(file_path):
                 if line.startswith("Indent"):
                     # Extract the group name
                     current_group = line.split(":")[0]
+                # End the current group at a settings line, wherever it is in the file
+                elif ":" in line and line.split(":")[0] in settings_keys:
+                    current_group = None
                 # If not a new group, add the line to the current group
                 elif current_group:
                     keyword_groups[current_group].add(line)
@@ -73,6 +107,218 @@ def load_keyword_groups(file_path):
         return None
 
 
+def parse_block_comments(value):
+    """
+    Parse the block comment delimiters of a settings file.
+
+    Args:
+        value (str): The delimiters separated by whitespace, given as pairs of opening and closing delimiters.
+
+    Returns:
+        list: A list of (opening, closing) tuples. An opening delimiter without a closing delimiter is ignored.
+    """
+    delimiters = value.split()
+    return list(zip(delimiters[::2], delimiters[1::2]))
+
+
+def intern_keywords(keywords):
+    """
+    Get the sorted tuple of interned keywords for a keyword group.
+
+    Interning stores every keyword once, however many languages use it.
+
+    Args:
+        keywords (iterable): The keywords of the group.
+
+    Returns:
+        tuple: The sorted keywords.
+    """
+    return tuple(
+        sorted(
+            set(
+                intern(keyword) if isinstance(keyword, str) else keyword
+                for keyword in keywords
+            )
+        )
+    )
+
+
+class LanguageProfile(object):
+    """
+    Frozen settings of a language.
+
+    Attributes:
+        keyword_groups (tuple): (group name, keywords) tuples for the keyword groups, sorted by group name.
+            The keywords are sorted tuples of interned strings.
+        use_spaces (bool): Whether spaces are used for indentation.
+        space_count (int): The number of spaces used for each indentation level.
+        comment_characters (tuple): Prefixes starting a comment that runs to the end of the line.
+        block_comments (tuple): (opening, closing) tuples delimiting block comments.
+        string_characters (tuple): Quote characters delimiting string literals.
+        escape_character (str): The character escaping the next character in a string literal, or an empty string
+            if string literals have no escape character.
+    """
+
+    __slots__ = (
+        "keyword_groups",
+        "use_spaces",
+        "space_count",
+        "comment_characters",
+        "block_comments",
+        "string_characters",
+        "escape_character",
+    )
+
+    def __init__(
+        self,
+        keyword_groups=(),
+        use_spaces=False,
+        space_count=1,
+        comment_characters=(),
+        block_comments=(),
+        string_characters=(),
+        escape_character="",
+    ):
+        object.__setattr__(
+            self,
+            "keyword_groups",
+            tuple(
+                (intern(str(group)), intern_keywords(keywords))
+                for group, keywords in sorted(keyword_groups)
+            ),
+        )
+        object.__setattr__(self, "use_spaces", bool(use_spaces))
+        object.__setattr__(self, "space_count", int(space_count))
+        object.__setattr__(
+            self,
+            "comment_characters",
+            tuple(comment_characters),
+        )
+        object.__setattr__(
+            self,
+            "block_comments",
+            tuple((opening, closing) for opening, closing in block_comments),
+        )
+        object.__setattr__(
+            self,
+            "string_characters",
+            tuple(string_characters),
+        )
+        object.__setattr__(self, "escape_character", escape_character)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LanguageProfile is frozen")
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Create a profile from a dictionary of language settings.
+
+        Empty keywords, such as the one saved by the settings window for an empty text widget, are left out, and
+        so are the groups left without keywords. A group without keywords would match every word.
+
+        Args:
+            settings (dict): The keyword groups, UseSpaces, SpaceCount, CommentCharacters, BlockComments,
+                StringCharacters and EscapeCharacter of the language.
+
+        Returns:
+            LanguageProfile: The profile of the language.
+        """
+        return cls(
+            keyword_groups=(
+                (group, [keyword for keyword in keywords if keyword])
+                for group, keywords in settings.items()
+                if group.startswith("Indent") and any(keywords)
+            ),
+            use_spaces=settings.get("UseSpaces", False),
+            space_count=settings.get("SpaceCount", 1),
+            comment_characters=settings.get("CommentCharacters", ()),
+            block_comments=settings.get("BlockComments", ()),
+            string_characters=settings.get("StringCharacters", ()),
+            escape_character=settings.get("EscapeCharacter", ""),
+        )
+
+    def to_settings(self):
+        """
+        Get the settings of the profile as a dictionary that can be edited.
+
+        Returns:
+            dict: The keyword groups as lists of keywords, UseSpaces, SpaceCount, CommentCharacters, BlockComments,
+                StringCharacters and EscapeCharacter of the language.
+        """
+        settings = dict(
+            (group, list(keywords)) for group, keywords in self.keyword_groups
+        )
+        settings["UseSpaces"] = self.use_spaces
+        settings["SpaceCount"] = self.space_count
+        settings["CommentCharacters"] = list(self.comment_characters)
+        settings["BlockComments"] = list(self.block_comments)
+        settings["StringCharacters"] = list(self.string_characters)
+        settings["EscapeCharacter"] = self.escape_character
+        return settings
+
+    def memory_usage(self, seen=None):
+        """
+        Get the number of bytes used by the profile.
+
+        Args:
+            seen (set or None): The ids of objects already counted, used to count objects shared between profiles
+                only once.
+
+        Returns:
+            int: The size in bytes of the profile and the objects it references.
+        """
+        if seen is None:
+            seen = set()
+        size = 0
+        pending = [self] + [getattr(self, name) for name in self.__slots__]
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            size += sys.getsizeof(obj)
+            if isinstance(obj, tuple):
+                pending.extend(obj)
+        return size
+
+
+def report_profile_memory():
+    """
+    Print the memory used by the profile of each loaded language.
+
+    The size of a profile includes the keywords it shares with other languages. The total counts every shared
+    object once.
+
+    """
+    seen = set()
+    total_size = 0
+    for lang_name in sorted(language_settings):
+        profile = language_settings[lang_name]
+        print("{}: {} bytes".format(lang_name, profile.memory_usage()))
+        total_size += profile.memory_usage(seen)
+    print("Total for {} languages: {} bytes".format(len(language_settings), total_size))
+
+
+def report_fast_path_counters():
+    """
+    Print how much of the last beautified document was emitted unchanged by the fast path.
+
+    """
+    print(
+        "Fast path: {} of {} lines ({:.0%}), {} of {} characters ({:.0%})".format(
+            fast_path_counters["fast_path_lines"],
+            fast_path_counters["lines"],
+            fast_path_counters["fast_path_lines"]
+            / float(max(fast_path_counters["lines"], 1)),
+            fast_path_counters["fast_path_characters"],
+            fast_path_counters["characters"],
+            fast_path_counters["fast_path_characters"]
+            / float(max(fast_path_counters["characters"], 1)),
+        )
+    )
+
+
 def load_language_settings():
     """
     Load language settings from configuration files.
@@ -80,12 +326,13 @@ def load_language_settings():
     This function iterates through files in the specified folder (settings_folder) that start with "keyword_groups_"
     and have a ".txt" extension. It extracts the language name from the file name, loads keyword groups using the
     load_keyword_groups function, and updates the global language_settings dictionary with the loaded settings.
-    Additionally, it reads specific settings from each file, such as UseSpaces, SpaceCount, and CommentCharacters,
-    and updates the language_settings dictionary accordingly.
+    Additionally, it reads specific settings from each file, such as UseSpaces, SpaceCount, CommentCharacters,
+    BlockComments, StringCharacters and EscapeCharacter, and updates the language_settings dictionary accordingly.
 
     Global Variables:
         language_settings (dict): A dictionary containing language settings, where keys are language names and values
-            are dictionaries containing keyword groups, UseSpaces flag, SpaceCount, and CommentCharacters.
+            are LanguageProfile objects containing keyword groups, UseSpaces flag, SpaceCount, CommentCharacters,
+            BlockComments, StringCharacters and EscapeCharacter.
 
     Raises:
         Exception: If an error occurs while loading the settings.
@@ -113,27 +360,40 @@ def load_language_settings():
             keyword_groups = load_keyword_groups(settings_file_path)
             # Update language_settings if keyword groups are found
             if keyword_groups:
-                if lang_name not in language_settings:
-                    language_settings[lang_name] = {}
-                language_settings[lang_name].update(keyword_groups)
+                settings = (
+                    language_settings[lang_name].to_settings()
+                    if lang_name in language_settings
+                    else {}
+                )
+                settings.update(keyword_groups)
                 try:
                     # Read specific settings from the file and update language_settings
                     with open(settings_file_path, "r") as f:
                         for line in f:
                             if line.startswith("UseSpaces:"):
                                 use_spaces = bool(int(line.split(":")[1].strip()))
-                                language_settings[lang_name]["UseSpaces"] = use_spaces
+                                settings["UseSpaces"] = use_spaces
                             elif line.startswith("SpaceCount:"):
                                 space_count = int(line.split(":")[1].strip())
-                                language_settings[lang_name]["SpaceCount"] = space_count
+                                settings["SpaceCount"] = space_count
                             elif line.startswith("CommentCharacters:"):
                                 comment_characters = line.split(":")[1].strip().split()
-                                language_settings[lang_name][
-                                    "CommentCharacters"
-                                ] = comment_characters
+                                settings["CommentCharacters"] = comment_characters
+                            elif line.startswith("BlockComments:"):
+                                block_comments = parse_block_comments(
+                                    line.split(":", 1)[1]
+                                )
+                                settings["BlockComments"] = block_comments
+                            elif line.startswith("StringCharacters:"):
+                                string_characters = line.split(":", 1)[1].split()
+                                settings["StringCharacters"] = string_characters
+                            elif line.startswith("EscapeCharacter:"):
+                                escape_character = line.split(":", 1)[1].strip()
+                                settings["EscapeCharacter"] = escape_character
                 except Exception as e:
                     # Print an error message if an error occurs while loading settings
                     print("Error loading settings for", lang_name, ":", e)
+                language_settings[lang_name] = LanguageProfile.from_settings(settings)
 
 
 # Load language settings when the script is executed
@@ -235,19 +495,182 @@ def get_languages_starting_with(letter):
     return languages
 
 
-def is_comment(line, comment_characters):
+def compile_lexical_syntax(
+    comment_characters, block_comments, string_characters, escape_character=""
+):
+    """
+    Compile the delimiters of the non-code regions of a language.
+
+    The delimiters are combined into a single regular expression, longest first, so that each line can be scanned
+    once. Delimiters starting or ending with a word character only match as whole words.
+
+    Args:
+        comment_characters (iterable): Prefixes starting a comment that runs to the end of the line.
+        block_comments (iterable): (opening, closing) tuples delimiting comments that may span several lines.
+        string_characters (iterable): Quote characters delimiting string literals.
+        escape_character (str): The character escaping the next character in a string literal, or an empty string
+            if string literals have no escape character.
+
+    Returns:
+        tuple or None: The compiled delimiter pattern and a dictionary mapping each delimiter to its kind and
+            closing pattern, or None if the language has no delimiters.
+    """
+    delimiters = {}
+    for quote in string_characters:
+        if quote:
+            # A string literal ends at the next unescaped quote character
+            if escape_character:
+                closing = re.compile(
+                    r"(?:{1}.|[^{1}{0}])*{0}".format(
+                        re.escape(quote), re.escape(escape_character)
+                    ),
+                    flags=re.DOTALL,
+                )
+            else:
+                closing = re.compile(r"[^{0}]*{0}".format(re.escape(quote)))
+            delimiters[quote] = ("string", closing)
+    for opening, closing in block_comments:
+        delimiters[opening] = ("block", closing)
+    for comment in comment_characters:
+        if comment:
+            delimiters[comment] = ("line", None)
+    if not delimiters:
+        return None
+    alternatives = []
+    for delimiter in sorted(delimiters, key=len, reverse=True):
+        alternative = re.escape(delimiter)
+        if re.match(r"\w", delimiter):
+            alternative = r"(?<!\w)" + alternative
+        if re.match(r"\w", delimiter[-1]):
+            alternative += r"(?!\w)"
+        alternatives.append(alternative)
+    return re.compile("|".join(alternatives)), delimiters
+
+
+def scan_code_spans(line, lexical_syntax, open_block=None):
+    """
+    Find the regions of a line that contain code.
+
+    Comments and string literals are skipped in a single pass over the line. A block comment that is still open
+    at the end of the line is carried over to the next line through open_block.
+
+    Args:
+        line (str): The line to scan.
+        lexical_syntax (tuple or None): The delimiters returned by compile_lexical_syntax.
+        open_block (str or None): The closing delimiter of a block comment left open by the previous line.
+
+    Returns:
+        tuple: A list of (start, end) tuples of the code regions of the line, and the closing delimiter of a block
+            comment left open at the end of the line or None.
+    """
+    if lexical_syntax is None:
+        return [(0, len(line))], None
+    delimiter_pattern, delimiters = lexical_syntax
+    code_spans = []
+    pos = 0
+    # Skip the remainder of a block comment opened on a previous line
+    if open_block is not None:
+        block_end = line.find(open_block)
+        if block_end == -1:
+            return code_spans, open_block
+        pos = block_end + len(open_block)
+    while True:
+        match = delimiter_pattern.search(line, pos)
+        if match is None:
+            code_spans.append((pos, len(line)))
+            return code_spans, None
+        if match.start() > pos:
+            code_spans.append((pos, match.start()))
+        kind, closing = delimiters[match.group()]
+        if kind == "line":
+            return code_spans, None
+        if kind == "block":
+            block_end = line.find(closing, match.end())
+            if block_end == -1:
+                return code_spans, closing
+            pos = block_end + len(closing)
+        else:
+            string_end = closing.match(line, match.end())
+            # An unterminated string literal runs to the end of the line
+            if string_end is None:
+                return code_spans, None
+            pos = string_end.end()
+
+
+def has_code(line, code_spans):
     """
-    Check if a line is a comment based on the provided comment characters.
+    Check if any of the code regions of a line contains more than whitespace.
 
     Args:
         line (str): The line to check.
-        comment_characters (iterable): Iterable containing characters used for comments.
+        code_spans (list): The (start, end) tuples of the code regions of the line.
+
+    Returns:
+        bool: True if the line contains code, False if it only contains comments, strings or whitespace.
+    """
+    return any(
+        non_whitespace_pattern.search(line, start, end) for start, end in code_spans
+    )
+
+
+def build_keyword_dict(keyword_groups):
+    """
+    Build a dictionary mapping lowercase keywords to their original form.
+
+    Args:
+        keyword_groups (dict): A dictionary containing keyword groups where keys are group names and values are sets of keywords.
 
     Returns:
-        bool: True if the line is a comment, False otherwise.
+        dict: A dictionary where keys are lowercase keywords and values are the keywords as written in the settings.
+    """
+    keyword_dict = {}
+    for group_keywords in keyword_groups.values():
+        for keyword in group_keywords:
+            keyword_dict[keyword.lower()] = keyword
+    return keyword_dict
 
+
+def has_expected_indentation(line, indentation):
     """
-    return any(line.strip().startswith(comment) for comment in comment_characters)
+    Check if a line already starts with exactly the expected indentation.
+
+    Args:
+        line (str): The line to check.
+        indentation (str): The indentation the line is expected to start with.
+
+    Returns:
+        bool: True if the line starts with the indentation and is followed by a non-whitespace character.
+    """
+    return (
+        len(line) > len(indentation)
+        and line.startswith(indentation)
+        and not line[len(indentation)].isspace()
+    )
+
+
+def has_canonical_keyword_case(line, keyword_dict, start=0, end=None):
+    """
+    Check if every keyword in a line is already capitalized as written in the keyword groups.
+
+    This performs the same word matching as adjust_keyword_capitalization without building a new line.
+
+    Args:
+        line (str): The line to check.
+        keyword_dict (dict): A dictionary mapping lowercase keywords to their original form.
+        start (int): The position in the line where the check starts.
+        end (int or None): The position in the line where the check ends, or None for the end of the line.
+
+    Returns:
+        bool: True if adjust_keyword_capitalization would return the region unchanged, False otherwise.
+    """
+    if end is None:
+        end = len(line)
+    for match in word_pattern.finditer(line, start, end):
+        word = match.group()
+        keyword = keyword_dict.get(word.lower())
+        if keyword is not None and keyword != word:
+            return False
+    return True
 
 
 def adjust_keyword_capitalization(line, keyword_groups):
@@ -262,12 +685,21 @@ def adjust_keyword_capitalization(line, keyword_groups):
     Returns:
         str: The adjusted line with proper capitalization for keywords.
     """
-    # Create a dictionary mapping lowercase keywords to their original form
-    keyword_dict = {}
-    for group_keywords in keyword_groups.values():
-        for keyword in group_keywords:
-            keyword_dict[keyword.lower()] = keyword
+    return capitalize_keywords(line, build_keyword_dict(keyword_groups))
+
+
+def capitalize_keywords(line, keyword_dict):
+    """
+    Adjusts the capitalization of keywords in the given line using a prebuilt keyword dictionary.
+    This function preserves punctuation marks and capitalizes keywords accordingly.
+
+    Args:
+        line (str): The line to adjust.
+        keyword_dict (dict): A dictionary mapping lowercase keywords to their original form.
 
+    Returns:
+        str: The adjusted line with proper capitalization for keywords.
+    """
     # Adjust the capitalization of keywords while preserving punctuation marks
     adjusted_line = ""
     current_word = ""
@@ -295,6 +727,35 @@ def adjust_keyword_capitalization(line, keyword_groups):
     return adjusted_line
 
 
+def adjust_code_capitalization(line, code_spans, start, keyword_dict):
+    """
+    Adjusts the capitalization of keywords in the code regions of a line, leaving comments and strings untouched.
+
+    Args:
+        line (str): The line to adjust.
+        code_spans (list): The (start, end) tuples of the code regions of the line.
+        start (int): The position in the line where the adjusted line starts.
+        keyword_dict (dict): A dictionary mapping lowercase keywords to their original form.
+
+    Returns:
+        str: The adjusted line from position start, with proper capitalization for keywords in the code regions.
+    """
+    adjusted_parts = []
+    pos = start
+    for span_start, span_end in code_spans:
+        if span_end <= pos:
+            continue
+        span_start = max(span_start, pos)
+        # Keep the comments and strings before the code region as they are
+        adjusted_parts.append(line[pos:span_start])
+        adjusted_parts.append(
+            capitalize_keywords(line[span_start:span_end], keyword_dict)
+        )
+        pos = span_end
+    adjusted_parts.append(line[pos:])
+    return "".join(adjusted_parts)
+
+
 def compile_keyword_regex(keywords):
     """
     Compile a regular expression pattern for matching keywords.
@@ -394,15 +855,33 @@ def create_language_tab(language_window, language, keyword_groups, settings_file
 
     # Function to save settings to file
     def save_settings_file(settings_file_path):
-        global language_settings, use_spaces, space_count
+        global use_spaces, space_count
         with open(settings_file_path, "w") as f:
             f.write("# Code Beautifier settings file for {}\n".format(language))
             f.write("# Do not edit this file unless you know what you're doing!\n\n")
             f.write("CommentCharacters: {}\n".format(" ".join(comment_characters)))
             f.write("UseSpaces: {}\n".format(int(use_spaces)))
-            f.write("SpaceCount: {}\n\n".format(space_count))
+            f.write("SpaceCount: {}\n".format(space_count))
+            f.write(
+                "BlockComments: {}\n".format(
+                    " ".join(
+                        " ".join(delimiters)
+                        for delimiters in keyword_groups.get("BlockComments", [])
+                    )
+                )
+            )
+            f.write(
+                "StringCharacters: {}\n".format(
+                    " ".join(keyword_groups.get("StringCharacters", []))
+                )
+            )
+            f.write(
+                "EscapeCharacter: {}\n\n".format(
+                    keyword_groups.get("EscapeCharacter", "")
+                )
+            )
             for group, keywords in keyword_groups.items():
-                if group not in ["CommentCharacters", "UseSpaces", "SpaceCount"]:
+                if group.startswith("Indent"):
                     f.write("{}:\n{}\n\n".format(group, "\n".join(keywords)))
         lang_name = (
             os.path.basename(settings_file_path)
@@ -411,10 +890,14 @@ def create_language_tab(language_window, language, keyword_groups, settings_file
             .replace("_", " ")
         )
         lang_name = lang_name.replace("udf - ", "").strip()
-        language_settings[lang_name] = keyword_groups
-        language_settings[lang_name]["UseSpaces"] = use_spaces
-        language_settings[lang_name]["SpaceCount"] = space_count
-        language_settings[lang_name]["CommentCharacters"] = comment_characters
+        # Send a copy of the settings to the running script, the window keeps editing its own
+        settings = dict(keyword_groups)
+        settings["UseSpaces"] = use_spaces
+        settings["SpaceCount"] = space_count
+        settings["CommentCharacters"] = comment_characters
+        profile = LanguageProfile.from_settings(settings)
+        saved_profiles[language] = profile
+        settings_updates.put((lang_name, profile))
 
     # Function to save settings when focus is lost
     def save_on_focus_out(event):
@@ -505,8 +988,8 @@ def create_language_tab(language_window, language, keyword_groups, settings_file
     # Function to initialize use spaces checkmark
     def initialize_use_spaces_checkmark():
         global use_spaces
-        if "UseSpaces" in language_settings.get(language, {}):
-            use_spaces = language_settings[language]["UseSpaces"]
+        if "UseSpaces" in keyword_groups:
+            use_spaces = keyword_groups["UseSpaces"]
             if use_spaces:
                 indent_option_checkbutton.select()
             else:
@@ -515,8 +998,8 @@ def create_language_tab(language_window, language, keyword_groups, settings_file
     # Function to initialize space count spinbox
     def initialize_space_count_spinbox():
         global space_count
-        if "SpaceCount" in language_settings.get(language, {}):
-            space_count = language_settings[language]["SpaceCount"]
+        if "SpaceCount" in keyword_groups:
+            space_count = keyword_groups["SpaceCount"]
             space_count_spinbox.delete(0, tk.END)
             space_count_spinbox.insert(0, space_count)
 
@@ -527,7 +1010,7 @@ def create_language_tab(language_window, language, keyword_groups, settings_file
     language_window.protocol("WM_DELETE_WINDOW", save_on_close)
 
 
-def create_language_buttons(letter, root_geometry):
+def create_language_buttons(root, letter, root_geometry):
     """
     Create buttons for languages starting with a specific letter.
 
@@ -535,12 +1018,13 @@ def create_language_buttons(letter, root_geometry):
     When a button is clicked, it triggers the 'language_button_click' function.
 
     Args:
+        root (tk.Tk): The alphabetical selection window, whose event loop runs the new window.
         letter (str): The starting letter of the languages.
         root_geometry (str): The geometry string for the Tkinter window.
 
     """
     # Create a new Tkinter window
-    language_window = tk.Tk()
+    language_window = tk.Toplevel(root)
     language_window.title("Languages Starting with %s" % letter)
     language_window.geometry(root_geometry)
     language_window.attributes("-topmost", True)
@@ -558,9 +1042,6 @@ def create_language_buttons(letter, root_geometry):
         )
         btn.pack()  # Pack the button into the window
 
-    # Run the Tkinter event loop
-    language_window.mainloop()
-
 
 def language_button_click(language, language_window):
     """
@@ -576,7 +1057,9 @@ def language_button_click(language, language_window):
     tab.attributes("-topmost", True)
     settings_file_path = get_settings_file_path(language)
     try:
-        keyword_groups = language_settings.get(language, {})
+        # Edit a snapshot of the settings, saved settings are sent back through settings_updates
+        profile = saved_profiles.get(language, language_settings.get(language))
+        keyword_groups = profile.to_settings() if profile is not None else {}
         create_language_tab(tab, language, keyword_groups, settings_file_path)
     except IOError:
         return
@@ -613,7 +1096,7 @@ def create_alphabetical_window():
             root,
             text=letter,
             font=("consolas", 12, "normal"),
-            command=lambda l=letter: create_language_buttons(l, root_geometry),
+            command=lambda l=letter: create_language_buttons(root, l, root_geometry),
         )
         # Calculate button position based on index
         row = idx // 5
@@ -630,12 +1113,45 @@ def create_alphabetical_window():
     root.mainloop()
 
 
+def launch_settings_window():
+    """
+    Open the alphabetical selection window in its own thread.
+
+    The Tkinter event loop of the settings window runs in a separate thread, so that the editor stays responsive
+    while the window is open. Only one settings window is opened at a time.
+
+    """
+    global settings_window_thread
+    if settings_window_thread is not None and settings_window_thread.is_alive():
+        return
+    settings_window_thread = threading.Thread(target=create_alphabetical_window)
+    settings_window_thread.daemon = True
+    settings_window_thread.start()
+
+
+def apply_settings_updates():
+    """
+    Apply the language settings saved in the settings window to the running script.
+
+    Global Variables:
+        language_settings (dict): Updated with the profiles received through settings_updates.
+
+    """
+    while True:
+        try:
+            lang_name, profile = settings_updates.get_nowait()
+        except Queue.Empty:
+            return
+        language_settings[lang_name] = profile
+
+
 def on_char_add(args):
     """
     Event handler for adding characters in the editor.
 
     This function is triggered whenever a character is added in the editor. It checks if the added character
     triggers the opening of the alphabetical window for language selection. If so, it opens the alphabetical window.
+    Only the last character of the trigger word is looked at before reading the word around the cursor.
 
     Args:
         args: Additional arguments passed to the event handler.
@@ -643,6 +1159,10 @@ def on_char_add(args):
     """
     global show_alphabetical_window
 
+    # Return early unless the added character can complete the trigger
+    if args.get("ch") not in settings_trigger_characters:
+        return
+
     # Get the current cursor position in the editor
     pos = editor.getCurrentPos()
     # Extract the word around the cursor position
@@ -658,7 +1178,133 @@ def on_char_add(args):
 
     # If the trigger is present, open the alphabetical window
     if show_alphabetical_window:
-        create_alphabetical_window()
+        launch_settings_window()
+
+
+def beautify_text(text, profile, fast_path=True):
+    """
+    Beautify a document based on the settings of its language.
+
+    Lines that already have the expected indentation and keyword capitalization are emitted unchanged instead
+    of being rebuilt. The number of lines and characters that took this fast path is stored in fast_path_counters.
+
+    Args:
+        text (str): The document to beautify.
+        profile (LanguageProfile): The settings of the language of the document.
+        fast_path (bool): Whether lines that are already correctly formatted are emitted unchanged.
+
+    Returns:
+        str: The beautified document.
+    """
+    # Extract relevant settings from language settings
+    indent_groups = dict(profile.keyword_groups)
+    indent_unit = " " * profile.space_count if profile.use_spaces else "\t"
+
+    leading_whitespace_pattern = re.compile(r"^\s+")
+    keyword_patterns = {
+        group: compile_keyword_regex(keywords)
+        for group, keywords in indent_groups.items()
+    }
+    keyword_dict = build_keyword_dict(indent_groups)
+    lexical_syntax = compile_lexical_syntax(
+        profile.comment_characters,
+        profile.block_comments,
+        profile.string_characters,
+        profile.escape_character,
+    )
+    beautified_lines = []
+    current_indentation = 0
+    open_block = None
+    lines = text.split("\n")
+    fast_path_lines = 0
+    fast_path_characters = 0
+
+    # Iterate through each line in the document
+    for line in lines:
+        # Find the code regions of the line, hiding comments and strings from the keyword patterns
+        code_spans, open_block = scan_code_spans(line, lexical_syntax, open_block)
+        if not line.strip():
+            # Blank lines that are already empty are emitted unchanged
+            if fast_path and not line:
+                fast_path_lines += 1
+            beautified_lines.append("")
+        elif not has_code(line, code_spans):
+            # Handle lines containing only comments or strings
+            indentation = indent_unit * current_indentation
+            if fast_path and has_expected_indentation(line, indentation):
+                beautified_lines.append(line)
+                fast_path_lines += 1
+                fast_path_characters += len(line)
+            else:
+                # Keep trailing whitespace, such as the carriage return of CRLF line endings
+                line = re.sub(leading_whitespace_pattern, "", line)
+                beautified_lines.append(indentation + line)
+        else:
+            # Handle lines containing code
+            indent_right, indent_left, indent_both, indent_none = (
+                False,
+                False,
+                False,
+                False,
+            )
+            # Check for keyword patterns in the code regions only
+            for group, pattern in keyword_patterns.items():
+                if any(pattern.search(line, start, end) for start, end in code_spans):
+                    if group == "IndentRight":
+                        indent_right = True
+                    elif group == "IndentLeft":
+                        indent_left = True
+                    elif group == "IndentBoth":
+                        indent_both = True
+                    elif group == "IndentNone":
+                        indent_none = True
+            # Adjust indentation based on patterns
+            if indent_left and not indent_both:
+                current_indentation = max(0, current_indentation - 1)
+            elif indent_both:
+                current_indentation = max(0, current_indentation - 1)
+            indentation = indent_unit * current_indentation
+            if (
+                fast_path
+                and has_expected_indentation(line, indentation)
+                and all(
+                    has_canonical_keyword_case(line, keyword_dict, start, end)
+                    for start, end in code_spans
+                )
+            ):
+                # Emit the line unchanged if it is already correctly formatted
+                beautified_lines.append(line)
+                fast_path_lines += 1
+                fast_path_characters += len(line)
+            else:
+                leading_whitespace = leading_whitespace_pattern.match(line)
+                line = adjust_code_capitalization(
+                    line,
+                    code_spans,
+                    leading_whitespace.end() if leading_whitespace else 0,
+                    keyword_dict,
+                )
+                beautified_lines.append(indentation + line)
+            if indent_right or (indent_both and line.strip()):
+                current_indentation += 1
+            elif indent_none:
+                pass
+    if beautified_lines and not beautified_lines[-1]:
+        beautified_lines = beautified_lines[:-1]
+    beautified_lines.append("")
+
+    # Record how much of the document took the fast path, not counting the line separators
+    line_count = len(lines)
+    if text.endswith("\n"):
+        # The empty string after the last newline is not a line of the document
+        line_count -= 1
+        if fast_path:
+            fast_path_lines -= 1
+    fast_path_counters["lines"] = line_count
+    fast_path_counters["fast_path_lines"] = fast_path_lines
+    fast_path_counters["characters"] = len(text) - (len(lines) - 1)
+    fast_path_counters["fast_path_characters"] = fast_path_characters
+    return "\n".join(beautified_lines)
 
 
 def beautify_code(args):
@@ -670,6 +1316,7 @@ def beautify_code(args):
 
     """
     try:
+        apply_settings_updates()
         current_bufferID = args["bufferID"]
         lang_type = notepad.getLangType(current_bufferID)
         lang_name = (
@@ -678,86 +1325,18 @@ def beautify_code(args):
             else str(editor.getLexerLanguage()).upper()
         )
         lang_name = lang_name.replace("udf - ", "")
-        keyword_groups = language_settings.get(lang_name, {})
+        profile = language_settings.get(lang_name)
 
         # If no keyword groups found, return
-        if not keyword_groups:
+        if profile is None or not profile.keyword_groups:
             return
 
-        # Extract relevant settings from language settings
-        indent_groups = {
-            group: keywords
-            for group, keywords in keyword_groups.items()
-            if group.startswith("Indent")
-        }
-        comment_characters = keyword_groups.get("CommentCharacters", set())
-        use_spaces = language_settings.get(lang_name, {}).get("UseSpaces", False)
-        space_count = language_settings.get(lang_name, {}).get("SpaceCount", 1)
-
         # Get the current document from the editor
         current_doc = editor.getText()
-        leading_whitespace_pattern = re.compile(r"^\s+")
-        keyword_patterns = {
-            group: compile_keyword_regex(keywords)
-            for group, keywords in indent_groups.items()
-        }
-        beautified_lines = []
-        current_indentation = 0
-
-        # Iterate through each line in the document
-        for line in current_doc.split("\n"):
-            if is_comment(line, comment_characters):
-                # Handle comment lines
-                indentation = (
-                    " " * space_count * current_indentation
-                    if use_spaces
-                    else "\t" * current_indentation
-                )
-                beautified_lines.append(indentation + line.strip())
-            else:
-                if line.strip():
-                    # Handle non-empty lines
-                    indent_right, indent_left, indent_both, indent_none = (
-                        False,
-                        False,
-                        False,
-                        False,
-                    )
-                    # Check for keyword patterns
-                    for group, pattern in keyword_patterns.items():
-                        if pattern.search(line):
-                            if group == "IndentRight":
-                                indent_right = True
-                            elif group == "IndentLeft":
-                                indent_left = True
-                            elif group == "IndentBoth":
-                                indent_both = True
-                            elif group == "IndentNone":
-                                indent_none = True
-                    # Adjust indentation based on patterns
-                    if indent_left and not indent_both:
-                        current_indentation = max(0, current_indentation - 1)
-                    elif indent_both:
-                        current_indentation = max(0, current_indentation - 1)
-                    indentation = (
-                        " " * space_count * current_indentation
-                        if use_spaces
-                        else "\t" * current_indentation
-                    )
-                    line = re.sub(leading_whitespace_pattern, "", line)
-                    line = adjust_keyword_capitalization(line, indent_groups)
-                    beautified_lines.append(indentation + line)
-                    if indent_right or (indent_both and line.strip()):
-                        current_indentation += 1
-                    elif indent_none:
-                        pass
-                else:
-                    beautified_lines.append("")
-        if beautified_lines and not beautified_lines[-1]:
-            beautified_lines = beautified_lines[:-1]
-        beautified_lines.append("")
-        beautified_code = "\n".join(beautified_lines)
-        editor.setText(beautified_code)
+        beautified_code = beautify_text(current_doc, profile)
+        # Leave the document untouched if nothing had to change
+        if beautified_code != current_doc:
+            editor.setText(beautified_code)
     except Exception as e:
         print("Error in beautify_code:", e)
         return